@@ -0,0 +1,64 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+from sentence_transformers import SentenceTransformer
+
+from build_catalog import DEFAULT_MODEL, LANGUAGES, build_catalogs
+
+# Times three builds of the catalogs in a temporary copy of the ESCO export: a full build (nothing to
+# reuse), a no-op rebuild, and a rebuild after changing the description of 1% of the occupations of
+# every language. The ESCO directory and the real catalogs are not touched.
+# usage: python bench_catalog_build.py --esco-dir esco/ [--processes 4] [--change 0.01]
+
+
+def change_descriptions(esco_dir, language, share):
+    path = os.path.join(esco_dir, f"occupations_{language}.csv")
+    occupations = pd.read_csv(path, dtype=str, keep_default_na=False)
+    changed = occupations.sample(frac=share, random_state=0).index
+    occupations.loc[changed, "description"] = occupations.loc[changed, "description"] + " (revised)"
+    occupations.to_csv(path, index=False)
+    return len(changed)
+
+
+def timed_build(name, encoder, esco_dir, output_dir, args):
+    start = time.perf_counter()
+    reports, prepare_seconds, encode_seconds = build_catalogs(
+        encoder, args.model, esco_dir, output_dir, args.languages, args.batch_size, args.processes
+    )
+    total = time.perf_counter() - start
+    encoded = sum(report["encoded"] for report in reports)
+    written = sum(report["written"] for report in reports)
+    print(f"{name:>12}: {total:7.1f}s  (read and diff {prepare_seconds:.1f}s, encode {encode_seconds:.1f}s)  "
+          f"{encoded} encoded, {written}/{len(reports)} catalogs written")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time full, no-op and partial catalog builds")
+    parser.add_argument("--esco-dir", required=True)
+    parser.add_argument("--languages", nargs="+", default=list(LANGUAGES))
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--change", type=float, default=0.01, help="share of occupations changed per language")
+    args = parser.parse_args()
+
+    encoder = SentenceTransformer(args.model)
+    with tempfile.TemporaryDirectory() as work_dir:
+        esco_dir = os.path.join(work_dir, "esco")
+        output_dir = os.path.join(work_dir, "catalogs")
+        shutil.copytree(args.esco_dir, esco_dir)
+        os.makedirs(output_dir)
+
+        timed_build("full", encoder, esco_dir, output_dir, args)
+        timed_build("no-op", encoder, esco_dir, output_dir, args)
+        changed = sum(change_descriptions(esco_dir, language, args.change) for language in args.languages)
+        timed_build(f"{args.change:.0%} change", encoder, esco_dir, output_dir, args)
+        print(f"{changed} descriptions changed")
+
+
+if __name__ == "__main__":
+    main()
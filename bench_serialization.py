@@ -0,0 +1,176 @@
+import asyncio
+import gzip
+import json
+import random
+import time
+import timeit
+import warnings
+from typing import Optional
+
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+# Compares the payload size, the server-side cost and the client decode time of the v1 and v2
+# /process-data responses for a BMC of nine 300-word sections. The server cost is measured through
+# the real FastAPI endpoint path (request parsing, response_model validation, rendering), with the
+# pipeline replaced by a fixed result and the ASGI app called in process, so no network is involved.
+# usage: python bench_serialization.py
+
+# Newer FastAPI releases than the pinned one deprecate ORJSONResponse, the bench measures the pinned usage
+warnings.filterwarnings("ignore", message="ORJSONResponse is deprecated")
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SECTION_TITLES = [
+    "Customer Segments", "Value Proposition", "Customer Relationships",
+    "Channels", "Revenue Streams", "Key Resources",
+    "Key Activities", "Key Partners", "Cost Structure",
+]
+SECTION_FIELDS = [
+    "customer_segments", "value_proposition", "customer_relationships",
+    "channels", "revenue_streams", "key_resources",
+    "key_activities", "key_partners", "cost_structure",
+]
+WORDS = (
+    "the bakery serves artisan bread to local cafés and families every morning customers value "
+    "fresh quality \"organic\" flour partners suppliers delivery subscription revenue costs rent staff"
+).split()
+# One different 300-word paragraph per section, seeded so both versions serialize the same text
+rng = random.Random(0)
+PARAGRAPHS = [" ".join(rng.choice(WORDS) for _ in range(300)) for _ in range(9)]
+
+
+# Same models as mainV4.py
+class ProcessedDataResponse(BaseModel):
+    message: str
+    catalog_version: Optional[str] = None
+
+
+class UserInputRequest(BaseModel):
+    user_input: str
+    language: str
+
+
+class BMCSections(BaseModel):
+    customer_segments: Optional[str] = None
+    value_proposition: Optional[str] = None
+    customer_relationships: Optional[str] = None
+    channels: Optional[str] = None
+    revenue_streams: Optional[str] = None
+    key_resources: Optional[str] = None
+    key_activities: Optional[str] = None
+    key_partners: Optional[str] = None
+    cost_structure: Optional[str] = None
+
+
+class MatchedOccupation(BaseModel):
+    label: str
+    score: float
+    language: Optional[str] = None
+
+
+class BMCResponseV2(BaseModel):
+    language: str
+    catalog_version: str
+    occupation_match: str
+    matched_occupations: list[MatchedOccupation]
+    sections: BMCSections
+
+
+def v2_content():
+    return {
+        "language": "en",
+        "catalog_version": "4ecd8c03dca8",
+        "occupation_match": "baker",
+        "matched_occupations": [{"label": f"occupation {i}", "score": 0.5 - i / 100, "language": "en"} for i in range(7)],
+        "sections": dict(zip(SECTION_FIELDS, PARAGRAPHS)),
+    }
+
+
+app = FastAPI()
+
+
+@app.post("/process-data", response_model=ProcessedDataResponse)
+def process_data(request: UserInputRequest):
+    # As in mainV4.py: sections dumped with indent=4, then the response validated and dumped again
+    message = json.dumps(dict(zip(SECTION_TITLES, PARAGRAPHS)), indent=4, ensure_ascii=False)
+    return {"message": message, "catalog_version": "4ecd8c03dca8"}
+
+
+@app.post("/v2/process-data", response_model=BMCResponseV2, response_class=ORJSONResponse)
+def process_data_v2(request: UserInputRequest):
+    # As in mainV4.py: the response is rendered directly, response_model only documents it
+    return ORJSONResponse(v2_content())
+
+
+@app.post("/v2/process-data-validated", response_model=BMCResponseV2, response_class=ORJSONResponse)
+def process_data_v2_validated(request: UserInputRequest):
+    # Returning the dict instead: FastAPI validates it against response_model and runs jsonable_encoder first
+    return v2_content()
+
+
+REQUEST_BODY = json.dumps({"user_input": "I want to open a bakery", "language": "en"}).encode("utf-8")
+
+
+async def call_endpoint(path):
+    # One in-process ASGI request, returns the response body
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(REQUEST_BODY)).encode())],
+        "client": ("127.0.0.1", 1), "server": ("127.0.0.1", 8000),
+    }
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": REQUEST_BODY, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def time_endpoint(path, number, repeat=5):
+    # Best of `repeat` runs, the other runs mostly measure noise from the rest of the machine
+    await call_endpoint(path)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            await call_endpoint(path)
+        elapsed = (time.perf_counter() - start) / number * 1e6
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def v1_decode(body):
+    # Clients have to decode twice to reach the sections
+    return json.loads(json.loads(body)["message"])
+
+
+def v2_decode(body):
+    return orjson.loads(body)["sections"]
+
+
+def report(name, path, decode, number=2000):
+    body = asyncio.run(call_endpoint(path))
+    endpoint_us = asyncio.run(time_endpoint(path, number))
+    decode_us = min(timeit.repeat(lambda: decode(body), number=number, repeat=5)) / number * 1e6
+    sizes = f"raw {len(body):>6} B  gzip {len(gzip.compress(body)):>6} B"
+    if brotli is not None:
+        sizes += f"  br {len(brotli.compress(body)):>6} B"
+    print(f"{name}: {sizes}  endpoint {endpoint_us:7.1f} us  client decode {decode_us:7.1f} us")
+
+
+if __name__ == "__main__":
+    report("v1", "/process-data", v1_decode)
+    report("v2", "/v2/process-data", v2_decode)
+    report("v2 validated", "/v2/process-data-validated", v2_decode)
@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+
+from sentence_transformers import SentenceTransformer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from catalog import load_catalog, encode_descriptions, UnifiedIndex
+
+# Compares six per-language indexes (all-MiniLM-L6-v2, the default mode) with the unified multilingual
+# index of the "auto" mode: memory of the embedding matrices and of the encoders, and query latency.
+# Run it from the directory holding the grouped_df_*.pkl files; the first run encodes the catalogs
+# with the multilingual model and caches the result next to them.
+# usage: python bench_unified_index.py [multilingual model name]
+
+LANGUAGES = ("en", "de", "es", "fr", "it", "nl")
+QUERIES = [
+    "I want to open a bakery with a small café",
+    "Ich möchte einen mobilen Fahrradreparaturservice gründen",
+    "Quiero crear una agencia de viajes para personas mayores",
+    "Je veux lancer une entreprise de nettoyage écologique",
+    "Voglio aprire una scuola di cucina per turisti",
+    "Ik wil een webshop voor tweedehands kinderkleding starten",
+]
+
+
+def model_megabytes(encoder):
+    return sum(p.numel() * p.element_size() for p in encoder.parameters()) / 2**20
+
+
+def timed(func, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    multilingual_name = sys.argv[1] if len(sys.argv) > 1 else "paraphrase-multilingual-MiniLM-L12-v2"
+    encoder = SentenceTransformer("all-MiniLM-L6-v2")
+    multilingual = SentenceTransformer(multilingual_name)
+
+    catalogs = {
+        language: load_catalog(language, f"grouped_df_{language}.pkl", encoder.get_sentence_embedding_dimension())
+        for language in LANGUAGES
+    }
+    embeddings = {
+        language: encode_descriptions(multilingual, multilingual_name, catalog, os.getcwd())
+        for language, catalog in catalogs.items()
+    }
+    index = UnifiedIndex(catalogs, embeddings)
+
+    separate_mb = sum(catalog.embeddings.nbytes for catalog in catalogs.values()) / 2**20
+    unified_mb = index.embeddings.nbytes / 2**20
+    print(f"occupations: {len(index.rows)}")
+    print(f"matrices: six per-language {separate_mb:.1f} MiB, unified {unified_mb:.1f} MiB")
+    print(f"encoders: all-MiniLM-L6-v2 {model_megabytes(encoder):.1f} MiB, {multilingual_name} {model_megabytes(multilingual):.1f} MiB")
+
+    query_embeddings = encoder.encode(QUERIES)
+    multilingual_embeddings = multilingual.encode(QUERIES)
+
+    def search_one_language():
+        for query in query_embeddings:
+            cosine_similarity([query], catalogs["en"].embeddings)
+
+    def search_six_languages():
+        for query in query_embeddings:
+            for catalog in catalogs.values():
+                cosine_similarity([query], catalog.embeddings)
+
+    def search_unified():
+        for query in multilingual_embeddings:
+            index.search(query, 7)
+
+    per_query = len(QUERIES)
+    print(f"encode: all-MiniLM-L6-v2 {timed(lambda: encoder.encode(QUERIES[0]), 10):.2f} ms, "
+          f"{multilingual_name} {timed(lambda: multilingual.encode(QUERIES[0]), 10):.2f} ms")
+    print(f"rank: one language {timed(search_one_language) / per_query:.3f} ms, "
+          f"six separate indexes {timed(search_six_languages) / per_query:.3f} ms, "
+          f"unified {timed(search_unified) / per_query:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import argparse
+import hashlib
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalog import DEFAULT_CONTEXT_MAX_CHARS, compute_catalog_version, write_contexts
+
+# Builds the grouped_df_<language>.pkl catalogs (and their .contexts.json) from the ESCO CSV export.
+# Every occupation gets a content hash of the text it is embedded from; rows whose hash is already in
+# the previous catalog reuse its embedding, so an ESCO update only encodes new or changed descriptions.
+# The texts to encode of all languages are encoded together, in large batches, optionally on several
+# processes. A catalog whose content did not change is not rewritten, so the service does not reload it.
+# usage: python build_catalog.py --esco-dir esco/ [--languages en de] [--processes 4] [--output-dir .]
+
+LANGUAGES = ("en", "de", "es", "fr", "it", "nl")
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+RELATION_TITLES = {"essential": "Essential skills", "optional": "Optional skills"}
+
+
+def catalog_path(output_dir, language):
+    return os.path.join(output_dir, f"grouped_df_{language}.pkl")
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def embedding_text(label, description):
+    # The description is what user input is compared to; the label stands in for the few without one
+    return description.strip() or label.strip()
+
+
+def read_csv(esco_dir, name, language):
+    return pd.read_csv(os.path.join(esco_dir, f"{name}_{language}.csv"), dtype=str, keep_default_na=False)
+
+
+def build_frame(esco_dir, language):
+    # One row per occupation: label, description, the concatenated ESCO details used in the BMC prompt
+    # and the hash of the embedded text
+    occupations = read_csv(esco_dir, "occupations", language)
+    skills = read_csv(esco_dir, "skills", language)
+    relations = read_csv(esco_dir, "occupationSkillRelations", language)
+
+    skill_lines = {
+        row.conceptUri: f"{row.preferredLabel}: {' '.join(row.description.split())}" if row.description
+        else row.preferredLabel
+        for row in skills.itertuples(index=False)
+    }
+    grouped_skills = {}
+    for row in relations.itertuples(index=False):
+        line = skill_lines.get(row.skillUri)
+        if line and row.relationType in RELATION_TITLES:
+            grouped_skills.setdefault((row.occupationUri, row.relationType), []).append(line)
+
+    rows = []
+    for row in occupations.itertuples(index=False):
+        label = row.preferredLabel.strip()
+        description = " ".join(row.description.split())
+        parts = [f"Occupation: {label}", f"Description: {description}"]
+        for relation_type, title in RELATION_TITLES.items():
+            lines = sorted(grouped_skills.get((row.conceptUri, relation_type), []))
+            if lines:
+                parts.append(f"{title}:")
+                parts.extend(lines)
+        rows.append({
+            "conceptUri1": row.conceptUri,
+            "preferredLabel1": label,
+            "description1": description,
+            "concatenated": "\n".join(parts),
+            "description_hash": text_hash(embedding_text(label, description)),
+        })
+
+    grouped_df = pd.DataFrame(rows).sort_values("preferredLabel1", kind="stable").reset_index(drop=True)
+    # The service looks occupations up by lower-cased label, keep the first of case-insensitive duplicates
+    duplicated = grouped_df["preferredLabel1"].str.lower().duplicated()
+    if duplicated.any():
+        print(f"{language}: dropping {int(duplicated.sum())} occupations with a duplicate label")
+        grouped_df = grouped_df[~duplicated].reset_index(drop=True)
+    return grouped_df
+
+
+def previous_embeddings(file_path, model_name):
+    # hash -> embedding of the current catalog, when it was encoded with the same model
+    if not os.path.exists(file_path):
+        return {}, None
+    previous_df = pd.read_pickle(file_path)
+    previous_model = previous_df.attrs.get("embedding_model")
+    if previous_model is None and model_name == DEFAULT_MODEL:
+        # Catalogs from the former external preprocessing carry no model name; the service has always
+        # matched them with DEFAULT_MODEL, so their embeddings are reused (hashed from their descriptions)
+        previous_model = model_name
+    if previous_model != model_name:
+        print(f"{file_path} was encoded with {previous_model}, all of it is encoded again with {model_name}")
+        return {}, previous_df
+    if "description_hash" in previous_df.columns:
+        hashes = previous_df["description_hash"]
+    else:
+        hashes = [
+            text_hash(embedding_text(str(label), " ".join(description.split()) if isinstance(description, str) else ""))
+            for label, description in zip(previous_df["preferredLabel1"], previous_df["description1"])
+        ]
+    return dict(zip(hashes, previous_df["description_embedding"])), previous_df
+
+
+def encode_texts(encoder, texts, batch_size, processes):
+    if not texts:
+        return np.zeros((0, encoder.get_sentence_embedding_dimension()), dtype=np.float32)
+    if processes > 1:
+        pool = encoder.start_multi_process_pool(["cpu"] * processes)
+        try:
+            embeddings = encoder.encode_multi_process(texts, pool, batch_size=batch_size)
+        finally:
+            encoder.stop_multi_process_pool(pool)
+    else:
+        embeddings = encoder.encode(texts, batch_size=batch_size, show_progress_bar=len(texts) > batch_size)
+    return np.asarray(embeddings, dtype=np.float32)
+
+
+def same_catalog(grouped_df, previous_df):
+    # Unchanged content and embeddings from the same model: rewriting the file would only trigger a reload
+    columns = ["conceptUri1", "preferredLabel1", "description1", "concatenated", "description_hash"]
+    if previous_df is None or previous_df.attrs != grouped_df.attrs or list(previous_df.columns) != list(grouped_df.columns):
+        return False
+    return previous_df[columns].equals(grouped_df[columns])
+
+
+def write_catalog(file_path, grouped_df, context_max_chars):
+    # The contexts are written for the version of the new file before that file replaces the old one,
+    # so the watcher never loads the new catalog without them
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    grouped_df.to_pickle(tmp_path)
+    version = compute_catalog_version(tmp_path)
+    write_contexts(file_path, context_max_chars, grouped_df, version)
+    os.replace(tmp_path, file_path)
+    return version
+
+
+def build_catalogs(encoder, model_name, esco_dir, output_dir, languages, batch_size=512, processes=1,
+                   context_max_chars=DEFAULT_CONTEXT_MAX_CHARS):
+    # Returns one report per language: rows, reused and encoded embeddings, whether the file was written
+    start = time.perf_counter()
+    plans = {}
+    missing = {}
+    for language in languages:
+        grouped_df = build_frame(esco_dir, language)
+        grouped_df.attrs["embedding_model"] = model_name
+        reuse, previous_df = previous_embeddings(catalog_path(output_dir, language), model_name)
+        plans[language] = (grouped_df, reuse, previous_df)
+        for text_key, label, description in zip(
+            grouped_df["description_hash"], grouped_df["preferredLabel1"], grouped_df["description1"]
+        ):
+            if text_key not in reuse:
+                missing.setdefault(text_key, embedding_text(label, description))
+    prepare_seconds = time.perf_counter() - start
+
+    # One encode call for every language, so the batches stay full even when few rows changed per language
+    start = time.perf_counter()
+    encoded = dict(zip(missing, encode_texts(encoder, list(missing.values()), batch_size, processes)))
+    encode_seconds = time.perf_counter() - start
+
+    reports = []
+    for language, (grouped_df, reuse, previous_df) in plans.items():
+        start = time.perf_counter()
+        grouped_df["description_embedding"] = [
+            reuse[text_key] if text_key in reuse else encoded[text_key] for text_key in grouped_df["description_hash"]
+        ]
+        reused = int(grouped_df["description_hash"].isin(reuse.keys()).sum())
+        file_path = catalog_path(output_dir, language)
+        written = not same_catalog(grouped_df, previous_df)
+        version = write_catalog(file_path, grouped_df, context_max_chars) if written else compute_catalog_version(file_path)
+        reports.append({
+            "language": language,
+            "rows": len(grouped_df),
+            "reused": reused,
+            "encoded": len(grouped_df) - reused,
+            "written": written,
+            "version": version,
+            "write_seconds": time.perf_counter() - start,
+        })
+    return reports, prepare_seconds, encode_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the grouped_df_*.pkl catalogs from the ESCO CSV export")
+    parser.add_argument("--esco-dir", required=True,
+                        help="directory with occupations_<lang>.csv, skills_<lang>.csv and occupationSkillRelations_<lang>.csv")
+    parser.add_argument("--output-dir", default=".", help="where the catalogs are read from and written to")
+    parser.add_argument("--languages", nargs="+", default=list(LANGUAGES))
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="encoder, must be the one the service matches with")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--processes", type=int, default=1, help="encoder processes, 1 to encode in this process")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_CONTEXT_MAX_CHARS,
+                        help="length cap of one context block, must match CONTEXT_MAX_CHARS of the service")
+    args = parser.parse_args()
+
+    # Imported here so --help does not load torch
+    from sentence_transformers import SentenceTransformer
+
+    start = time.perf_counter()
+    encoder = SentenceTransformer(args.model)
+    load_seconds = time.perf_counter() - start
+    reports, prepare_seconds, encode_seconds = build_catalogs(
+        encoder, args.model, args.esco_dir, args.output_dir, args.languages,
+        args.batch_size, args.processes, args.max_chars,
+    )
+
+    for report in reports:
+        status = "written" if report["written"] else "unchanged"
+        print(f"{report['language']}: {report['rows']} occupations, {report['reused']} reused, "
+              f"{report['encoded']} encoded, {status} (version {report['version']}) in {report['write_seconds']:.1f}s")
+    total = time.perf_counter() - start
+    print(f"model load {load_seconds:.1f}s, read and diff {prepare_seconds:.1f}s, encode {encode_seconds:.1f}s, "
+          f"total {total:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+import glob
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+# A Catalog is an immutable snapshot of one grouped_df_*.pkl file.
+# The service never mutates a loaded catalog: a reload builds a new Catalog and swaps the
+# reference, so requests that already hold the old one keep using it until they finish.
+
+
+def file_signature(file_path):
+    # Cheap change detection (used by the file watcher) without hashing the whole pickle
+    stat = os.stat(file_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def compute_catalog_version(file_path):
+    # Content hash of the pickle, so identical files always get the same version
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:12]
+
+
+# Default length cap of the occupation context added to the BMC prompt
+DEFAULT_CONTEXT_MAX_CHARS = 3000
+
+
+def build_occupation_context(text, max_chars=DEFAULT_CONTEXT_MAX_CHARS):
+    # Whitespace collapsed, repeated lines dropped (case-insensitive) and the block capped at max_chars,
+    # so the prompt size no longer depends on how verbose an occupation's ESCO entry is
+    seen = set()
+    lines = []
+    length = 0
+    for line in str(text or "").splitlines():
+        line = " ".join(line.split())
+        key = line.lower()
+        if not line or key in seen:
+            continue
+        seen.add(key)
+        added = len(line) + (1 if lines else 0)
+        if length + added > max_chars:
+            remaining = max_chars - length - (1 if lines else 0)
+            if remaining > 0:
+                # Cut the last line on a word boundary
+                lines.append(line[:remaining].rsplit(" ", 1)[0])
+            break
+        lines.append(line)
+        length += added
+    return "\n".join(lines)
+
+
+def context_file_path(file_path):
+    return os.path.splitext(file_path)[0] + ".contexts.json"
+
+
+def write_contexts(file_path, max_chars=DEFAULT_CONTEXT_MAX_CHARS, grouped_df=None, version=None):
+    # Offline precompute: one context block per occupation, stored next to the catalog with the
+    # catalog version it was built from so the service can tell whether it is still valid
+    if grouped_df is None:
+        grouped_df = pd.read_pickle(file_path)
+    payload = {
+        "catalog_version": version or compute_catalog_version(file_path),
+        "max_chars": max_chars,
+        "labels": grouped_df['preferredLabel1'].tolist(),
+        "contexts": [build_occupation_context(text, max_chars) for text in grouped_df['concatenated']],
+    }
+    output_path = context_file_path(file_path)
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def read_contexts(file_path, version, labels, max_chars):
+    # Precomputed contexts if they were built from this exact catalog with the same cap, otherwise None
+    path = context_file_path(file_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if payload["catalog_version"] != version or payload["max_chars"] != max_chars or payload["labels"] != labels:
+            return None
+        contexts = payload["contexts"]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # Unreadable or corrupt: the caller builds the contexts itself, as for a missing file
+        print(f"Ignoring unusable contexts file {path}: {e}")
+        return None
+    if not isinstance(contexts, list) or len(contexts) != len(labels):
+        return None
+    return contexts
+
+
+class StringTable:
+    # Strings stored as one UTF-8 buffer plus offsets instead of one Python object per row.
+    # When the arrays are read-only mmaps, every worker reads the same physical pages.
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def from_strings(cls, strings):
+        encoded = [("" if s is None else str(s)).encode("utf-8") for s in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+
+class Catalog:
+    def __init__(self, language, file_path, version, signature, grouped_df, contexts):
+        self.language = language
+        self.file_path = file_path
+        self.version = version
+        self.signature = signature
+        # Stack the per-row embeddings once so ranking is a single matrix operation
+        self.embeddings = np.vstack(grouped_df['description_embedding'].values).astype(np.float32)
+        # Prompt-ready context block per occupation, aligned with the rows
+        self.contexts = StringTable.from_strings(contexts)
+        # The heavy columns now live in the arrays above, keep only the small ones in the frame
+        self.grouped_df = grouped_df.drop(columns=['description_embedding', 'concatenated']).reset_index(drop=True)
+        self.labels = self.grouped_df['preferredLabel1'].tolist()
+        self.label_index = {label.lower(): i for i, label in enumerate(self.labels)}
+
+    def occupation_context(self, occupation):
+        index = self.label_index.get(occupation.lower())
+        if index is None:
+            raise KeyError(f"Unknown occupation: {occupation}")
+        return self.contexts[index]
+
+
+def validate_catalog(catalog, embedding_dim):
+    # Refuse to swap in a catalog the running encoder cannot be compared against
+    if catalog.embeddings.ndim != 2 or catalog.embeddings.shape[1] != embedding_dim:
+        raise ValueError(
+            f"Catalog {catalog.file_path} has embedding shape {catalog.embeddings.shape}, "
+            f"expected dimension {embedding_dim}"
+        )
+    if not catalog.labels:
+        raise ValueError(f"Catalog {catalog.file_path} contains no occupations")
+
+    # Occupations are looked up by lower-cased label, so labels must be unique case-insensitively
+    lowered = catalog.grouped_df['preferredLabel1'].str.lower()
+    duplicates = lowered[lowered.duplicated()].unique().tolist()
+    if duplicates:
+        raise ValueError(
+            f"Catalog {catalog.file_path} has duplicate occupation labels: {', '.join(duplicates[:5])}"
+        )
+
+
+def _share_array(path, array):
+    # An existing file is reused only if it holds exactly this data: /dev/shm outlives the service and
+    # may hold files written by another build. Files are written under a temporary name and renamed,
+    # so concurrent workers never see a partial file.
+    if os.path.exists(path):
+        shared = np.load(path, mmap_mode="r")
+        if shared.dtype == array.dtype and np.array_equal(shared, array):
+            return shared
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, path)
+    except OSError:
+        # Do not leave a partial file taking space in /dev/shm
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return np.load(path, mmap_mode="r")
+
+
+def share_catalog(catalog, shared_dir):
+    # Move the embedding matrix and the context table to read-only mmaps under shared_dir
+    # (ideally /dev/shm). Processes loading the same catalog version map the same files.
+    base_name = os.path.splitext(os.path.basename(catalog.file_path))[0]
+    prefix = os.path.join(shared_dir, f"{base_name}.{catalog.version}")
+
+    try:
+        embeddings = _share_array(prefix + ".embeddings.npy", catalog.embeddings)
+        contexts = StringTable(
+            _share_array(prefix + ".contexts.npy", catalog.contexts.data),
+            _share_array(prefix + ".context-offsets.npy", catalog.contexts.offsets),
+        )
+    except OSError as e:
+        # e.g. ENOSPC on Docker's 64 MB /dev/shm: the catalog still works from its private arrays,
+        # it is only not shared between workers
+        print(f"Cannot share catalog {catalog.file_path} in {shared_dir}, keeping a private copy: {e}")
+        return False
+    catalog.embeddings = embeddings
+    catalog.contexts = contexts
+
+    # Older versions are still mapped by processes that use them, removing the names does not affect those
+    for path in glob.glob(os.path.join(shared_dir, f"{base_name}.*.npy")):
+        if not path.startswith(prefix + "."):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return True
+
+
+def load_catalog(language, file_path, embedding_dim, shared_dir=None, context_max_chars=DEFAULT_CONTEXT_MAX_CHARS):
+    # Take the signature first: if the file changes while we read it, the watcher sees a new
+    # signature on its next pass and loads again
+    signature = file_signature(file_path)
+    version = compute_catalog_version(file_path)
+    grouped_df = pd.read_pickle(file_path)
+
+    contexts = read_contexts(file_path, version, grouped_df['preferredLabel1'].tolist(), context_max_chars)
+    if contexts is None:
+        print(f"No precomputed contexts for {file_path} version {version}, building them now")
+        contexts = [build_occupation_context(text, context_max_chars) for text in grouped_df['concatenated']]
+
+    catalog = Catalog(language, file_path, version, signature, grouped_df, contexts)
+    validate_catalog(catalog, embedding_dim)
+    if shared_dir:
+        share_catalog(catalog, shared_dir)
+    return catalog
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def encode_descriptions(encoder, model_name, catalog, cache_dir=None, batch_size=256):
+    # Descriptions of one catalog encoded with another model (the multilingual one), cached on disk per
+    # catalog version and model so only new catalog versions are encoded again
+    base_name = os.path.splitext(os.path.basename(catalog.file_path))[0]
+    model_slug = re.sub(r"[^A-Za-z0-9]+", "-", model_name).strip("-")
+    cache_dir = cache_dir or os.path.dirname(catalog.file_path) or "."
+    path = os.path.join(cache_dir, f"{base_name}.{catalog.version}.{model_slug}.npy")
+    if os.path.exists(path):
+        return np.load(path, mmap_mode="r")
+
+    texts = catalog.grouped_df['description1'].fillna("").tolist()
+    embeddings = _normalize_rows(np.asarray(encoder.encode(texts, batch_size=batch_size), dtype=np.float32))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, embeddings)
+    os.replace(tmp_path, path)
+    return np.load(path, mmap_mode="r")
+
+
+class UnifiedIndex:
+    # All catalogs in one normalized matrix with a language tag per row, so one query searches every
+    # language in a single matrix product instead of one search per catalog
+    def __init__(self, catalogs, embeddings_by_language):
+        self.catalogs = dict(catalogs)
+        self.catalog_versions = {language: catalog.version for language, catalog in self.catalogs.items()}
+        self.version = hashlib.sha256(
+            json.dumps(self.catalog_versions, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+
+        languages = sorted(self.catalogs)
+        self.embeddings = np.vstack([embeddings_by_language[language] for language in languages])
+        self.languages = np.concatenate([
+            np.full(len(self.catalogs[language].labels), language) for language in languages
+        ])
+        self.rows = np.concatenate([
+            np.arange(len(self.catalogs[language].labels)) for language in languages
+        ])
+
+    def search(self, query_embedding, top_n):
+        # Cosine similarity: rows are normalized, so only the query needs normalizing
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        similarities = self.embeddings @ query
+        top_n = min(top_n, len(similarities))
+        top_indices = np.argpartition(-similarities, top_n - 1)[:top_n]
+        top_indices = top_indices[np.argsort(-similarities[top_indices])]
+        return [
+            (self.catalogs[self.languages[i]], int(self.rows[i]), float(similarities[i]))
+            for i in top_indices
+        ]
@@ -0,0 +1,34 @@
+import hashlib
+import random
+import time
+
+# Offline stand-in for Gemini (LLM_BACKEND=fake), used to replay traffic and to test without an API key.
+# Answers are deterministic for a given prompt and shaped like the real ones, so the parsing in ask_AI and
+# extract_sections runs as in production. FAKE_LLM_LATENCY adds a fixed delay per call.
+
+# No word close to a section title, so extract_sections only finds the real headings
+WORDS = (
+    "business local market service quality price online suppliers staff equipment marketing "
+    "community premium subscription delivery growth brand loyalty training team neighbourhood"
+).split()
+
+
+def _paragraph(rng, words=300):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def generate(prompt, stage, candidates=None, section_titles=None, latency=0.0):
+    if latency:
+        time.sleep(latency)
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+
+    if stage == "ask_AI":
+        # Agrees with the best ranked occupation, like the real model does most of the time
+        first = (candidates or "").split(",")[0].strip()
+        return f"{first or 'no'}\n{_paragraph(rng)}\n{_paragraph(rng, 20)}"
+
+    if section_titles:
+        # The BMC prompt, whether regular or speculative
+        return "\n\n".join(f"**{title}**\n{_paragraph(rng)}" for title in section_titles or [])
+
+    return _paragraph(rng)
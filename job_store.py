@@ -0,0 +1,146 @@
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Storage for background BMC jobs. Both stores keep the same job dict:
+# id, status (queued, running, done, failed), request, result, error, created_at, started_at, finished_at,
+# owner (the worker process that runs it, so jobs left unfinished by a dead worker can be failed)
+
+FINISHED_STATUSES = ("done", "failed")
+
+
+class InMemoryJobStore:
+    # Jobs live in the worker process, so clients must poll the worker that accepted the job
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def create(self, job_id, request, owner=None):
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "request": request,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "owner": owner,
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+        return dict(job)
+
+    def update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def fail_unfinished(self, should_fail, error):
+        # Marks failed the queued or running jobs for which should_fail(job) is true, returns how many
+        finished_at = time.time()
+        with self.lock:
+            failed = [
+                job for job in self.jobs.values()
+                if job["status"] not in FINISHED_STATUSES and should_fail(dict(job))
+            ]
+            for job in failed:
+                job.update(status="failed", error=error, finished_at=finished_at)
+        return len(failed)
+
+    def purge(self, older_than, unfinished_older_than=None):
+        # Fail jobs still unfinished long after they were created, then drop finished jobs whose result
+        # nobody fetched in time
+        if unfinished_older_than is not None:
+            self.fail_unfinished(lambda job: job["created_at"] < unfinished_older_than, "Job expired before it finished")
+        with self.lock:
+            expired = [
+                job_id for job_id, job in self.jobs.items()
+                if job["status"] in FINISHED_STATUSES and job["finished_at"] < older_than
+            ]
+            for job_id in expired:
+                del self.jobs[job_id]
+
+
+class SQLiteJobStore:
+    # Finished jobs survive restarts and every job is visible to every worker on the same host
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT, request TEXT, result TEXT, error TEXT, "
+                "created_at REAL, started_at REAL, finished_at REAL, owner TEXT)"
+            )
+            # Databases created before jobs had an owner
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(jobs)")]
+            if "owner" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, job_id, request, owner=None):
+        created_at = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at, owner) VALUES (?, ?, ?, ?, ?)",
+                (job_id, "queued", json.dumps(request, ensure_ascii=False), created_at, owner),
+            )
+        return self.get(job_id)
+
+    def update(self, job_id, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["request"] = json.loads(job["request"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def fail_unfinished(self, should_fail, error):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            rows = conn.execute(
+                "SELECT id, status, created_at, started_at, owner FROM jobs WHERE status NOT IN (?, ?)",
+                FINISHED_STATUSES,
+            ).fetchall()
+            failed = [row["id"] for row in rows if should_fail(dict(row))]
+            # The status check again in the UPDATE: a job may have finished since the SELECT
+            conn.executemany(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status NOT IN (?, ?)",
+                [(error, time.time(), job_id, *FINISHED_STATUSES) for job_id in failed],
+            )
+        return len(failed)
+
+    def purge(self, older_than, unfinished_older_than=None):
+        if unfinished_older_than is not None:
+            self.fail_unfinished(lambda job: job["created_at"] < unfinished_older_than, "Job expired before it finished")
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (*FINISHED_STATUSES, older_than),
+            )
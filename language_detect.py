@@ -0,0 +1,31 @@
+import re
+
+# Cheap local language detection for the six catalog languages: counts frequent function words.
+# Good enough to pick the prompt language of a business idea, and needs no model or extra dependency.
+
+STOPWORDS = {
+    "en": {"the", "and", "of", "to", "a", "in", "is", "for", "that", "with", "my", "i", "want", "an", "on",
+           "which", "will", "people", "would", "like", "from", "their", "it", "be", "are"},
+    "de": {"der", "die", "das", "und", "ich", "ein", "eine", "einen", "mit", "für", "nicht", "ist", "zu", "von",
+           "den", "im", "mein", "meine", "möchte", "auf", "sich", "dem", "des", "auch", "wir"},
+    "es": {"el", "la", "los", "las", "y", "de", "que", "en", "un", "una", "con", "para", "por", "mi", "quiero",
+           "es", "del", "al", "se", "lo", "como", "más", "su", "sus"},
+    "fr": {"le", "la", "les", "et", "de", "des", "un", "une", "je", "pour", "avec", "dans", "est", "du", "en",
+           "mon", "ma", "veux", "au", "qui", "aux", "sur", "ou", "pas", "vous"},
+    "it": {"il", "lo", "la", "gli", "le", "e", "di", "che", "un", "una", "per", "con", "in", "mio", "mia",
+           "voglio", "è", "del", "della", "sono", "dei", "nel", "alla", "anche"},
+    "nl": {"de", "het", "een", "en", "van", "ik", "wil", "met", "voor", "in", "op", "is", "dat", "mijn", "te",
+           "niet", "zijn", "bij", "ook", "aan", "wij", "naar", "die", "er"},
+}
+
+WORD_PATTERN = re.compile(r"[^\W\d_]+")
+
+
+def detect_language(text):
+    # Returns the best scoring language, or None when there is no clear winner (too short, a tie)
+    words = WORD_PATTERN.findall(text.lower())
+    scores = {language: sum(word in stopwords for word in words) for language, stopwords in STOPWORDS.items()}
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    if ranked[0][1] == 0 or ranked[0][1] == ranked[1][1]:
+        return None
+    return ranked[0][0]
@@ -1,8 +1,20 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Depends
+from fastapi.responses import StreamingResponse, PlainTextResponse, ORJSONResponse
+from starlette.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
-import pandas as pd
+from typing import Optional
+import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 import os
+import threading
+import time
+import gc
+import uuid
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 import json
@@ -10,6 +22,12 @@ import google.generativeai as genai  # Correct import for the generative AI libr
 from dotenv import load_dotenv
 import re
 from fuzzywuzzy import fuzz
+from prometheus_client import Counter, Gauge, Histogram, make_asgi_app
+from catalog import load_catalog, file_signature, encode_descriptions, UnifiedIndex, DEFAULT_CONTEXT_MAX_CHARS
+from language_detect import detect_language
+import fake_llm
+from job_store import InMemoryJobStore, SQLiteJobStore, FINISHED_STATUSES
+from profiler import RequestProfiler
 #from mangum import Mangum
 
 # Access your API key as an environment variable
@@ -18,7 +36,95 @@ api_key = os.getenv("API_KEY")  # Use your actual API key variable name from the
 # Set the API key for authentication
 genai.configure(api_key=api_key)
 
-app = FastAPI()
+# Compression of the /v2 responses: "gzip", "br" (needs brotli-asgi) or empty for none
+RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "").lower()
+# Shared secret for the /admin endpoints (sent as the X-Admin-Token header); without it they answer 403
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Seconds between checks of the catalog files for changes, 0 disables the watcher
+CATALOG_WATCH_INTERVAL = float(os.getenv("CATALOG_WATCH_INTERVAL", "0"))
+# POST /admin/reload-catalogs bumps this file and every worker on the host reloads within CATALOG_GENERATION_INTERVAL
+# seconds (0 turns it off, leaving the reload to the one worker that answered the call)
+CATALOG_GENERATION_INTERVAL = float(os.getenv("CATALOG_GENERATION_INTERVAL", "2"))
+# Number of occupation ranking results kept in memory
+MATCH_CACHE_SIZE = int(os.getenv("MATCH_CACHE_SIZE", "1024"))
+# Threads running background jobs, and how many accepted jobs may wait for them before POST /jobs returns 429
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+# "memory" (default) or "sqlite"; the SQLite store is shared by all workers on the host
+JOB_STORE = os.getenv("JOB_STORE", "memory")
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.sqlite3")
+# Seconds a finished job is kept for clients to fetch
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))
+# Seconds after which a job that is still queued or running is failed, in case its worker died without saying so
+JOB_RUN_TTL = float(os.getenv("JOB_RUN_TTL", "1800"))
+# Longest long-poll accepted by GET /jobs/{id}?wait=, and how often the store is checked meanwhile
+JOB_MAX_WAIT = float(os.getenv("JOB_MAX_WAIT", "60"))
+JOB_POLL_INTERVAL = 0.5
+# If set, every profile is also written there as <id>.collapsed
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+# Length cap of the occupation context added to the BMC prompt, must match precompute_contexts.py --max-chars
+CONTEXT_MAX_CHARS = int(os.getenv("CONTEXT_MAX_CHARS", str(DEFAULT_CONTEXT_MAX_CHARS)))
+# Language "auto": detect the language of the idea and search the occupations of all languages at once
+ENABLE_AUTO_LANGUAGE = os.getenv("ENABLE_AUTO_LANGUAGE", "0") == "1"
+MULTILINGUAL_MODEL = os.getenv("MULTILINGUAL_MODEL", "paraphrase-multilingual-MiniLM-L12-v2")
+# Where the multilingual catalog embeddings are cached, next to the catalogs by default
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR")
+# "gemini" (default) or "fake" for offline runs; FAKE_LLM_LATENCY is the delay of each fake call in seconds
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+# Start the BMC of the best ranked occupation in parallel with ask_AI when its similarity is at least this,
+# 0 disables speculation. SPECULATION_WORKERS bounds the speculative calls running at once.
+SPECULATION_THRESHOLD = float(os.getenv("SPECULATION_THRESHOLD", "0"))
+SPECULATION_WORKERS = int(os.getenv("SPECULATION_WORKERS", "4"))
+# Load every catalog at import time; with `gunicorn --preload` this happens once in the master before fork
+PRELOAD_CATALOGS = os.getenv("PRELOAD_CATALOGS", "0") == "1"
+# Directory for the read-only catalog mmaps shared by all workers (/dev/shm is memory backed)
+SHARED_CATALOG_DIR = os.getenv("SHARED_CATALOG_DIR") or ("/dev/shm" if PRELOAD_CATALOGS and os.path.isdir("/dev/shm") else None)
+CATALOG_GENERATION_FILE = os.getenv("CATALOG_GENERATION_FILE") or os.path.join(SHARED_CATALOG_DIR or ".", "catalog-generation.json")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Started here rather than at import time so that every worker process gets its own watcher
+    if CATALOG_WATCH_INTERVAL > 0 or CATALOG_GENERATION_INTERVAL > 0:
+        start_catalog_watcher(CATALOG_WATCH_INTERVAL, CATALOG_GENERATION_INTERVAL)
+    # Jobs left queued or running by a worker that crashed or was recycled would otherwise never finish
+    orphaned = job_store.fail_unfinished(lambda job: job_owner_is_gone(job["owner"]), "Worker stopped before the job finished")
+    if orphaned:
+        print(f"Marked {orphaned} orphaned jobs as failed")
+    yield
+    job_executor.shutdown(wait=False, cancel_futures=True)
+    job_store.fail_unfinished(lambda job: job["owner"] == job_owner(), "Worker stopped before the job finished")
+    speculation_executor.shutdown(wait=False, cancel_futures=True)
+
+
+class V2CompressionMiddleware:
+    # Compresses only the /v2 responses; the v1 shape stays byte for byte as before and the job
+    # event stream is not buffered by the compressor
+    def __init__(self, app, compression):
+        self.app = app
+        if compression == "br":
+            try:
+                from brotli_asgi import BrotliMiddleware
+                # Clients that do not accept br still get gzip
+                self.compressed_app = BrotliMiddleware(app, minimum_size=1000, gzip_fallback=True)
+                return
+            except ImportError:
+                print("brotli-asgi is not installed, compressing /v2 responses with gzip instead")
+        self.compressed_app = GZipMiddleware(app, minimum_size=1000)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/v2/"):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+
+app = FastAPI(lifespan=lifespan)
+if RESPONSE_COMPRESSION:
+    app.add_middleware(V2CompressionMiddleware, compression=RESPONSE_COMPRESSION)
+# Prometheus metrics (job queue depth, wait and run times)
+app.mount("/metrics", make_asgi_app())
 
 
 # Allow CORS for the specific origin (frontend URL)
@@ -34,6 +140,11 @@ app.add_middleware(
 model = SentenceTransformer('all-MiniLM-L6-v2')  # You can use any transformer model
 
 
+# Multilingual encoder of the "auto" language mode, loaded only when the mode is enabled
+multilingual_model = SentenceTransformer(MULTILINGUAL_MODEL) if ENABLE_AUTO_LANGUAGE else None
+
+SUPPORTED_LANGUAGES = ("en", "de", "es", "fr", "it", "nl")
+
 #grouped_df = pd.read_pickle('concatenated_file.pkl')
 
 def get_file_path_by_language(language: str) -> str:
@@ -58,49 +169,275 @@ def get_file_path_by_language(language: str) -> str:
         )
 
 
-def get_all_occupation_informations(occupation,grouped_df):
-  # Filter the DataFrame for the occupation 'astronaut'
-  occupation_description = grouped_df[grouped_df['preferredLabel1'].str.lower() == occupation.lower()]
+# Loaded catalogs by language. A request takes its catalog reference once and uses it to the end;
+# a reload swaps in a whole new Catalog, and the old one is freed when the last request using it finishes.
+catalogs = {}
+catalog_lock = threading.Lock()
+catalog_reload_lock = threading.Lock()
+# Signature of the last file that failed to load per language, so the watcher does not retry it every tick
+failed_catalog_signatures = {}
+
+
+def get_catalog(language: str):
+    catalog = catalogs.get(language)
+    if catalog is None:
+        with catalog_lock:
+            catalog = catalogs.get(language)
+            if catalog is None:
+                file_path = get_file_path_by_language(language)
+                catalog = load_catalog(language, file_path, model.get_sentence_embedding_dimension(), SHARED_CATALOG_DIR, CONTEXT_MAX_CHARS)
+                catalogs[language] = catalog
+                print(f"Catalog loaded: {language} version {catalog.version}")
+    return catalog
+
+
+def reload_catalog(language: str):
+    file_path = get_file_path_by_language(language)
+    current = catalogs.get(language)
+    if current is not None and current.signature == file_signature(file_path):
+        return current
+
+    # Build and validate the new version outside the lock, requests keep using the current one meanwhile
+    new_catalog = load_catalog(language, file_path, model.get_sentence_embedding_dimension(), SHARED_CATALOG_DIR, CONTEXT_MAX_CHARS)
+    with catalog_lock:
+        catalogs[language] = new_catalog
+    old_version = current.version if current is not None else None
+    print(f"Catalog swapped: {language} version {old_version} -> {new_catalog.version}")
+    return new_catalog
+
+
+def reload_catalogs(languages=None):
+    # Only catalogs already in memory are reloaded, the others are loaded fresh on first use
+    with catalog_reload_lock:
+        results = {}
+        for language in languages or list(catalogs):
+            try:
+                results[language] = reload_catalog(language).version
+            except Exception as e:
+                # A broken file never replaces a working catalog
+                print(f"Catalog reload failed for {language}: {e}")
+                try:
+                    failed_catalog_signatures[language] = file_signature(get_file_path_by_language(language))
+                except (OSError, ValueError):
+                    pass
+                results[language] = f"error: {e}"
+        return results
+
+
+def read_catalog_generation():
+    # Content of the generation file, None until the first POST /admin/reload-catalogs on this host
+    try:
+        with open(CATALOG_GENERATION_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def bump_catalog_generation(languages=None):
+    # Asks every worker process on the host to reload: their watchers compare this file with the last one seen
+    generation = {"id": uuid.uuid4().hex, "languages": languages}
+    tmp_path = f"{CATALOG_GENERATION_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(generation, f)
+    os.replace(tmp_path, CATALOG_GENERATION_FILE)
+    return generation
+
+
+def check_catalog_files():
+    changed = []
+    for language, catalog in list(catalogs.items()):
+        try:
+            signature = file_signature(catalog.file_path)
+            if signature != catalog.signature and signature != failed_catalog_signatures.get(language):
+                changed.append(language)
+        except OSError as e:
+            print(f"Catalog watcher cannot stat {catalog.file_path}: {e}")
+    if changed:
+        reload_catalogs(changed)
+
+
+def watch_catalogs(interval: float, generation_interval: float):
+    # Reloads when POST /admin/reload-catalogs bumped the generation file (checked every generation_interval)
+    # and, if interval > 0, when a catalog file changed
+    tick = min(i for i in (interval, generation_interval) if i > 0)
+    generation = read_catalog_generation()
+    # A worker forked from a preloading master (gunicorn --preload) starts with the master's catalogs, which
+    # may be older than the files and than the current generation: catch up once before waiting for changes
+    check_catalog_files()
+    last_file_check = time.monotonic()
+    while True:
+        time.sleep(tick)
+        current = read_catalog_generation()
+        if current is not None and current != generation:
+            generation = current
+            reload_catalogs(current.get("languages"))
+        if interval > 0 and time.monotonic() - last_file_check >= interval:
+            last_file_check = time.monotonic()
+            check_catalog_files()
+
+
+def start_catalog_watcher(interval: float, generation_interval: float):
+    thread = threading.Thread(
+        target=watch_catalogs, args=(interval, generation_interval), daemon=True, name="catalog-watcher"
+    )
+    thread.start()
+    return thread
 
-  # Access the concatenated column for the astronaut
-  occupation_description_concatenated = occupation_description['concatenated'].values[0]  # Get the value of the concatenated column
 
-  # Print or use the concatenated result
-  return occupation_description_concatenated
+def preload_catalogs():
+    for language in SUPPORTED_LANGUAGES:
+        get_catalog(language)
+    if ENABLE_AUTO_LANGUAGE:
+        get_unified_index()
+    # Objects created so far are inherited by forked workers; freezing them keeps the garbage
+    # collector from writing to their pages and turning shared copy-on-write pages into private copies
+    gc.collect()
+    gc.freeze()
 
 
-def find_top_matching_occupations(file_path: str, user_input: str, top_n: int = 3):
-    # Load the file from the given file path
-    grouped_df = pd.read_pickle(file_path)
-    
-    # Encode the user input
-    user_input_embedding = model.encode(user_input)
+# Unified multilingual index used by language "auto", built from the current catalogs on first use
+unified_index = None
+unified_index_lock = threading.Lock()
+unified_index_refresh_lock = threading.Lock()
 
-    # Compute similarity scores
-    grouped_df['similarity'] = grouped_df['description_embedding'].apply(
-        lambda emb: cosine_similarity([user_input_embedding], [emb]).item()
-    )
 
-    # Sort by similarity and select the top N matches
-    top_matches = grouped_df.nlargest(top_n, 'similarity')
+def build_unified_index():
+    current = {language: get_catalog(language) for language in SUPPORTED_LANGUAGES}
+    embeddings = {
+        language: encode_descriptions(multilingual_model, MULTILINGUAL_MODEL, catalog, EMBEDDING_CACHE_DIR)
+        for language, catalog in current.items()
+    }
+    index = UnifiedIndex(current, embeddings)
+    print(f"Unified index built: version {index.version}, {len(index.rows)} occupations")
+    return index
 
-    # Store matched occupation titles in a list and concatenate for display
-    matched_occupations_str = ""
-    matched_occupations_list = []
-    
-    for idx, match in top_matches.iterrows():
-        occupation = match['preferredLabel1']
-        print(f"Occupation: {occupation}")
-        print(f"Description: {match['description1']}")
-        print(f"Similarity score: {match['similarity']}")
-        print("\n---\n")
+
+def refresh_unified_index():
+    global unified_index
+    try:
+        new_index = build_unified_index()
+        with unified_index_lock:
+            unified_index = new_index
+    except Exception as e:
+        print(f"Unified index rebuild failed: {e}")
+    finally:
+        unified_index_refresh_lock.release()
+
+
+def get_unified_index():
+    global unified_index
+    if not ENABLE_AUTO_LANGUAGE:
+        raise ValueError("Language auto-detection is disabled, start the server with ENABLE_AUTO_LANGUAGE=1")
+    index = unified_index
+    if index is None:
+        with unified_index_lock:
+            if unified_index is None:
+                unified_index = build_unified_index()
+            return unified_index
+
+    # A catalog was hot reloaded: rebuild in the background and keep serving the current index meanwhile
+    outdated = any(catalogs.get(language) is not catalog for language, catalog in index.catalogs.items())
+    if outdated and unified_index_refresh_lock.acquire(blocking=False):
+        threading.Thread(target=refresh_unified_index, daemon=True, name="unified-index-refresh").start()
+    return index
+
+
+if PRELOAD_CATALOGS:
+    preload_catalogs()
+
+
+def get_all_occupation_informations(occupation,catalog):
+  # Precomputed, length-capped context block of the occupation (see precompute_contexts.py)
+  return catalog.occupation_context(occupation)
+
+
+# Ranking results keyed by (language, catalog version, input, top_n): a catalog swap changes the key,
+# so results computed against an old catalog are never served again and age out of the LRU
+match_cache = OrderedDict()
+match_cache_lock = threading.Lock()
+
+
+match_cache_stats = {"hits": 0, "misses": 0}
+MATCH_CACHE_REQUESTS = Counter("bmc_match_cache_requests_total", "Occupation ranking cache lookups", ["result"])
+
+
+def cached_match(cache_key, rank):
+    with match_cache_lock:
+        cached = match_cache.get(cache_key)
+        if cached is not None:
+            match_cache.move_to_end(cache_key)
+            match_cache_stats["hits"] += 1
+            MATCH_CACHE_REQUESTS.labels(result="hit").inc()
+            return cached
+        match_cache_stats["misses"] += 1
+    MATCH_CACHE_REQUESTS.labels(result="miss").inc()
+
+    result = rank()
+    if MATCH_CACHE_SIZE > 0:
+        with match_cache_lock:
+            match_cache[cache_key] = result
+            while len(match_cache) > MATCH_CACHE_SIZE:
+                match_cache.popitem(last=False)
+    return result
+
+
+def find_top_matching_occupations(catalog, user_input: str, top_n: int = 3):
+    def rank():
+        # Encode the user input
+        user_input_embedding = model.encode(user_input)
+
+        # Compute similarity scores against the whole catalog in one call
+        similarities = cosine_similarity([user_input_embedding], catalog.embeddings)[0]
+
+        # Sort by similarity and select the top N matches
+        top_indices = np.argsort(-similarities)[:top_n]
+
+        # Store matched occupation titles in a list and concatenate for display
+        matched_occupations_str = ""
+        matched_occupations_list = []
+        matched_scores = []
         
-        # Add to string and list
-        matched_occupations_str += occupation + ", "
-        matched_occupations_list.append(occupation)
+        for idx in top_indices:
+            match = catalog.grouped_df.iloc[idx]
+            occupation = match['preferredLabel1']
+            print(f"Occupation: {occupation}")
+            print(f"Description: {match['description1']}")
+            print(f"Similarity score: {similarities[idx]}")
+            print("\n---\n")
+            
+            # Add to string and list
+            matched_occupations_str += occupation + ", "
+            matched_occupations_list.append(occupation)
+            matched_scores.append(float(similarities[idx]))
+
+        return (matched_occupations_str, matched_occupations_list, matched_scores, [catalog.language] * len(matched_occupations_list))
 
-    # Return the concatenated string and list of top matches
-    return matched_occupations_str, matched_occupations_list
+    # Return the concatenated string, the list of top matches, their similarity scores and their languages
+    return cached_match((catalog.language, catalog.version, user_input, top_n), rank)
+
+
+def find_top_matching_occupations_all_languages(index, user_input: str, top_n: int = 3):
+    def rank():
+        # One pass over the occupations of every language with the multilingual encoder
+        matches = index.search(multilingual_model.encode(user_input), top_n)
+
+        matched_occupations_str = ""
+        matched_occupations_list = []
+        matched_scores = []
+        matched_languages = []
+        for catalog, row, score in matches:
+            occupation = catalog.labels[row]
+            print(f"Occupation ({catalog.language}): {occupation}")
+            print(f"Similarity score: {score}")
+            print("\n---\n")
+            matched_occupations_str += occupation + ", "
+            matched_occupations_list.append(occupation)
+            matched_scores.append(score)
+            matched_languages.append(catalog.language)
+
+        return (matched_occupations_str, matched_occupations_list, matched_scores, matched_languages)
+
+    return cached_match(("auto", index.version, user_input, top_n), rank)
 
 #because in german language we have occupations like friseur/friseurin so we will map this occupation parts to it , exp : map[firseur]=friseur/friseurin
 def construct_dict_from_list(occupations_list):
@@ -118,6 +455,22 @@ def construct_dict_from_list(occupations_list):
     
     return occupation_dict
 
+# Single entry point for the LLM calls; the fake backend gives deterministic offline answers (see fake_llm.py)
+LLM_CALLS = Counter("bmc_llm_calls_total", "LLM calls", ["stage"])
+LLM_PROMPT_CHARS = Counter("bmc_llm_prompt_chars_total", "Characters sent to the LLM", ["stage"])
+
+
+def call_llm(prompt: str, stage: str, candidates=None, section_titles=None):
+    # Upstream spend per stage, speculative BMC calls are counted separately
+    LLM_CALLS.labels(stage=stage).inc()
+    LLM_PROMPT_CHARS.labels(stage=stage).inc(len(prompt))
+    if LLM_BACKEND == "fake":
+        return fake_llm.generate(prompt, stage, candidates, section_titles, FAKE_LLM_LATENCY)
+    model = genai.GenerativeModel('gemini-pro')
+    response = model.generate_content(prompt)
+    return response.text
+
+
 def ask_AI(user_idea: str, matched_occupations: str, language: str):
     # Define the prompt based on the language
     prompts = {
@@ -176,12 +529,8 @@ def ask_AI(user_idea: str, matched_occupations: str, language: str):
 
 
     # Call the model to generate content
-    model = genai.GenerativeModel('gemini-pro')
-    response = model.generate_content(prompt)
-    print(response.text)
-    
-    # Extract the generated response text
-    response_text = response.text
+    response_text = call_llm(prompt, "ask_AI", candidates=matched_occupations)
+    print(response_text)
 
     # Split the response to get occupation match and skills paragraph separately
     parts = response_text.split('\n', 1)  # Split by first newline
@@ -198,14 +547,20 @@ def ask_AI(user_idea: str, matched_occupations: str, language: str):
     return  occupation_match, skills_paragraph
 
 
-def generate_content(user_idea, occupation_match, skills_paragraph, get_all_occupation_informations,matched_occupations_list,language,grouped_df):
+def is_listed_occupation(occupation_match, matched_occupations_list):
+    # Whether generate_content adds the occupation details; otherwise its prompt has only the skills summary
+    occupation_match = occupation_match if occupation_match is not None else ""
+    return not (occupation_match.lower() == "no" or occupation_match == "" or occupation_match.lower() not in matched_occupations_list)
+
+
+def generate_content(user_idea, occupation_match, skills_paragraph, get_all_occupation_informations,matched_occupations_list,language,catalog):
     # Ensure all variables are strings or have default values
     user_idea = user_idea if user_idea is not None else ""
     skills_paragraph = skills_paragraph if skills_paragraph is not None else ""
     occupation_match = occupation_match if occupation_match is not None else ""
 
     # Construct the content based on whether an occupation matches or not
-    if occupation_match.lower() == "no" or occupation_match == "" or occupation_match.lower() not in matched_occupations_list:
+    if not is_listed_occupation(occupation_match, matched_occupations_list):
         if language == "en":
             # English content for no specific match
             content = (
@@ -252,7 +607,7 @@ def generate_content(user_idea, occupation_match, skills_paragraph, get_all_occu
             raise ValueError(f"Unsupported language: {language}. Supported languages are 'en', 'de', 'es', 'fr', 'it', 'nl'.")
     else:
         # Content when a specific occupation matches
-        occu_infos = get_all_occupation_informations(occupation_match, grouped_df) or ""
+        occu_infos = get_all_occupation_informations(occupation_match, catalog) or ""
         if language == "en":
             # English content for a matched occupation
             content = (
@@ -306,7 +661,7 @@ def generate_content(user_idea, occupation_match, skills_paragraph, get_all_occu
 
     return content
 
-def process_full_BMC(content,language):
+def process_full_BMC(content,language,stage="process_full_BMC"):
     if language.lower() == "en" or language.lower() == "english":
         prompt = (
         "Generate a comprehensive Business Model Canvas (BMC) for the following role using the provided description"
@@ -733,64 +1088,72 @@ def process_full_BMC(content,language):
         "Jeder Abschnitt ist ein Absatz!"
         )
         
-    model = genai.GenerativeModel('gemini-pro')
-    response = model.generate_content(
-        prompt,
-    )
-    return response.text
+    # Only the fake backend uses the titles, to shape its answer like the real model's
+    section_titles = get_prompt_section_titles(language) if LLM_BACKEND == "fake" else None
+    return call_llm(prompt, stage, section_titles=section_titles)
 
 import re
 
-def extract_sections(response_text, language):
-    sections = {}
-
-    # Define the section markers for English and German
-    section_titles_en = [
+# Section titles of the BMC in each language, in the same order as BMC_SECTION_FIELDS
+SECTION_TITLES = {
+    "en": [
         "Customer Segments", "Value Proposition", "Customer Relationships",
         "Channels", "Revenue Streams", "Key Resources",
         "Key Activities", "Key Partners", "Cost Structure"
-    ]
-    section_titles_de = [
+    ],
+    "de": [
         "Kundensegmente", "Wertangebote", "Kundenbeziehungen",
         "Kanäle", "Einnahmequellen", "Schlüsselressourcen",
         "Schlüsselaktivitäten", "Schlüsselpartner", "Kostenstruktur"
-    ]
-    section_titles_fr = [
+    ],
+    "fr": [
         "Segments de Clients", "Proposition de Valeur", "Relations Clients",
         "Canaux", "Sources de Revenus", "Ressources Clés",
         "Activités Clés", "Partenaires Clés", "Structure des Coûts"
-    ]
-    section_titles_es = [
+    ],
+    "es": [
         "Segmentos de Clientes", "Propuesta de Valor", "Relaciones con Clientes",
         "Canales", "Flujos de Ingresos", "Recursos Clave",
         "Actividades Clave", "Socios Clave", "Estructura de Costos"
-    ]
-    section_titles_it = [
+    ],
+    "it": [
         "Segmenti di Clienti", "Proposta di Valore", "Relazioni con i Clienti",
         "Canali", "Flussi di Entrate", "Risorse Chiave",
         "Attività Chiave", "Partner Chiave", "Struttura dei Costi"
-    ]
-    section_titles_nl = [
+    ],
+    "nl": [
         "Klantsegmenten", "Waardepropositie", "Klantrelaties",
         "Kanalen", "Inkomstenstromen", "Key Resources",
         "Key Activities", "Key Partners", "Kostenstructuur"
-    ]
+    ],
+}
+SECTION_LANGUAGE_NAMES = {"english": "en", "german": "de", "french": "fr", "spanish": "es", "italian": "it", "dutch": "nl"}
 
-    # Set the correct section titles based on the language
-    if language.lower() == "en" or language.lower() == "english":
-        section_titles = section_titles_en
-    elif language.lower() == "de" or language.lower() == "german":
-        section_titles = section_titles_de
-    elif language.lower() == "fr" or language.lower() == "french":
-        section_titles = section_titles_fr
-    elif language.lower() == "es" or language.lower() == "spanish":
-        section_titles = section_titles_es
-    elif language.lower() == "it" or language.lower() == "italian":
-        section_titles = section_titles_it
-    elif language.lower() == "nl" or language.lower() == "dutch":
-        section_titles = section_titles_nl
-    else:
+
+def get_section_titles(language):
+    language = language.lower()
+    language = SECTION_LANGUAGE_NAMES.get(language, language)
+    if language not in SECTION_TITLES:
         raise ValueError("Unsupported language")
+    return SECTION_TITLES[language]
+
+
+# Language names process_full_BMC accepts besides the codes
+BMC_PROMPT_LANGUAGE_NAMES = {"espagnol": "es", "italien": "it", "francais": "fr"}
+
+
+def get_prompt_section_titles(language):
+    # Titles the process_full_BMC prompt asks for, including its aliases and its German fallback
+    language = language.lower()
+    language = BMC_PROMPT_LANGUAGE_NAMES.get(language) or SECTION_LANGUAGE_NAMES.get(language, language)
+    return SECTION_TITLES.get(language, SECTION_TITLES["de"])
+
+
+def extract_sections(response_text, language):
+    sections = {}
+
+    # Set the correct section titles based on the language (a copy, matched titles are removed from it)
+    section_titles = list(get_section_titles(language))
 
     # Helper function to find the closest section title using fuzzy matching
     def get_best_match(line, titles):
@@ -846,28 +1209,202 @@ def extract_sections(response_text, language):
     return sections
 
 
+# Typed v2 response: the nine sections as fields instead of a JSON string inside a JSON string
+BMC_SECTION_FIELDS = [
+    "customer_segments", "value_proposition", "customer_relationships",
+    "channels", "revenue_streams", "key_resources",
+    "key_activities", "key_partners", "cost_structure",
+]
+
+
+class BMCSections(BaseModel):
+    customer_segments: Optional[str] = None
+    value_proposition: Optional[str] = None
+    customer_relationships: Optional[str] = None
+    channels: Optional[str] = None
+    revenue_streams: Optional[str] = None
+    key_resources: Optional[str] = None
+    key_activities: Optional[str] = None
+    key_partners: Optional[str] = None
+    cost_structure: Optional[str] = None
+
+
+class MatchedOccupation(BaseModel):
+    label: str
+    score: float
+    language: Optional[str] = None
+
+
+class BMCResponseV2(BaseModel):
+    language: str
+    catalog_version: str
+    occupation_match: str
+    matched_occupations: list[MatchedOccupation]
+    sections: BMCSections
+
+
+def to_v2_response(result):
+    # extract_sections keys the sections by their title in the request language, map them to the fixed fields
+    titles = get_section_titles(result["language"])
+    sections = {field: result["sections"].get(title) for field, title in zip(BMC_SECTION_FIELDS, titles)}
+    return {
+        "language": result["language"],
+        "catalog_version": result["catalog_version"],
+        "occupation_match": result["occupation_match"],
+        "matched_occupations": result["matched_occupations"],
+        "sections": sections,
+    }
+
+
 # Define a response model (optional, but useful for clarity in your API)
 class ProcessedDataResponse(BaseModel):
     message: str
+    catalog_version: Optional[str] = None
     
 class UserInputRequest(BaseModel):
     user_input: str
     language: str
 
-# Create an endpoint to trigger the processing
-@app.post("/process-data", response_model=ProcessedDataResponse)
-def process_data(request: UserInputRequest):
-    try:   
-        # Extract the language from the request
-        user_language = request.language
-        #get the filepath of the pkl file we will use
-        FilePath = get_file_path_by_language(user_language)
-        grouped_df = pd.read_pickle(FilePath)
+# Profiles the next N pipeline runs or a sampled share of them, see POST /admin/profile
+request_profiler = RequestProfiler(output_dir=PROFILE_DIR)
+
+
+STAGE_SECONDS = Histogram(
+    "bmc_stage_seconds", "Time spent in each pipeline stage", ["stage"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60),
+)
+
+
+@contextmanager
+def timed_stage(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings[stage] = timings.get(stage, 0.0) + elapsed
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+
+
+# Speculative BMC: when the best ranked occupation is a clear match, its BMC is requested while ask_AI
+# still runs. If ask_AI picks that occupation the speculative BMC is used, otherwise it is thrown away.
+speculation_executor = ThreadPoolExecutor(max_workers=SPECULATION_WORKERS, thread_name_prefix="bmc-speculation")
+speculations_in_flight = {"count": 0}
+speculations_lock = threading.Lock()
+
+SPECULATIONS = Counter(
+    "bmc_speculations_total", "Speculative BMC calls by outcome (hit, miss, error, abandoned, skipped)", ["outcome"]
+)
+SPECULATION_WASTED_CALLS = Counter(
+    "bmc_speculation_wasted_calls_total", "Speculative BMC calls that reached the LLM and were thrown away"
+)
+SPECULATION_SAVED_SECONDS = Histogram(
+    "bmc_speculation_saved_seconds", "Latency saved by a speculation hit",
+    buckets=(0.5, 1, 2.5, 5, 10, 15, 20, 30, 45, 60),
+)
+
+
+class Speculation:
+    def __init__(self, occupation, future):
+        self.occupation = occupation
+        self.future = future
+        # hit, miss, error or abandoned once settled
+        self.outcome = None
+
+
+def speculative_BMC(user_input, occupation, matched_occupations_list, language, catalog):
+    started = time.perf_counter()
+    # ask_AI has not answered yet, so this prompt has the occupation details but no skills summary
+    content = generate_content(user_input, occupation, "", get_all_occupation_informations, matched_occupations_list, language, catalog)
+    BMC_response = process_full_BMC(content, language, stage="speculative_BMC")
+    return BMC_response, time.perf_counter() - started
+
+
+def start_speculation(user_input, matched_occupations_list, matched_scores, matched_languages, language, matched_catalogs):
+    if SPECULATION_THRESHOLD <= 0 or not matched_scores or matched_scores[0] < SPECULATION_THRESHOLD:
+        return None
+    # Without the skills summary, a prompt without the occupation details would hold only the idea
+    # (e.g. capitalized labels such as German "Bäcker/Bäckerin" are not matched by generate_content)
+    if not is_listed_occupation(matched_occupations_list[0], matched_occupations_list):
+        return None
+    with speculations_lock:
+        # A speculation that has to wait for a free thread would not save anything
+        if speculations_in_flight["count"] >= SPECULATION_WORKERS:
+            SPECULATIONS.labels(outcome="skipped").inc()
+            return None
+        speculations_in_flight["count"] += 1
+
+    occupation = matched_occupations_list[0]
+    catalog = matched_catalogs.get(matched_languages[0], matched_catalogs.get(language))
+    future = speculation_executor.submit(speculative_BMC, user_input, occupation, matched_occupations_list, language, catalog)
+
+    def finished(_):
+        with speculations_lock:
+            speculations_in_flight["count"] -= 1
+
+    future.add_done_callback(finished)
+    return Speculation(occupation, future)
+
+
+def discard_speculation(speculation, outcome):
+    speculation.outcome = outcome
+    SPECULATIONS.labels(outcome=outcome).inc()
+    # cancel() only succeeds while the call has not started; a running LLM call cannot be interrupted
+    if not speculation.future.cancel():
+        SPECULATION_WASTED_CALLS.inc()
+
+
+def take_speculation(speculation, occupation_match):
+    # The speculative BMC if ask_AI agreed with it, otherwise None and the regular path runs
+    if speculation is None:
+        return None
+    if occupation_match != speculation.occupation:
+        discard_speculation(speculation, "miss")
+        return None
+
+    waited_from = time.perf_counter()
+    try:
+        BMC_response, duration = speculation.future.result()
+    except Exception as e:
+        print(f"Speculative BMC failed: {e}")
+        speculation.outcome = "error"
+        SPECULATIONS.labels(outcome="error").inc()
+        return None
+    speculation.outcome = "hit"
+    SPECULATIONS.labels(outcome="hit").inc()
+    SPECULATION_SAVED_SECONDS.observe(max(duration - (time.perf_counter() - waited_from), 0.0))
+    return BMC_response
+
+
+# The whole BMC pipeline for one idea, shared by the synchronous endpoint and the job workers
+def run_pipeline(user_input: str, user_language: str):
+    # Seconds spent in each stage, returned with the result and exported as bmc_stage_seconds
+    timings = {}
+    if user_language == "auto":
+        #search the occupations of every language at once, then answer in the language of the idea
+        index = get_unified_index()
+        with timed_stage(timings, "match"):
+            matched_occupations_str,matched_occupations_list,matched_scores,matched_languages = find_top_matching_occupations_all_languages(index,user_input,top_n=7)
+        # Too short to detect (a single word): use the language most of the matches come from. The list is
+        # ranked and max keeps the first maximum, so a tie goes to the language of the best match
+        user_language = detect_language(user_input) or max(matched_languages, key=matched_languages.count)
+        matched_catalogs = index.catalogs
+        catalog_version = index.version
+    else:
+        #get the catalog of the language, held for the whole request even if a reload swaps it meanwhile
+        catalog = get_catalog(user_language)
         # Finding n_matching occupations
-        matched_occupations_str,matched_occupations_list = find_top_matching_occupations(FilePath,request.user_input,top_n=7)
-        print("Matched occupations:", matched_occupations_str)
+        with timed_stage(timings, "match"):
+            matched_occupations_str,matched_occupations_list,matched_scores,matched_languages = find_top_matching_occupations(catalog,user_input,top_n=7)
+        matched_catalogs = {user_language: catalog}
+        catalog_version = catalog.version
+    print("Matched occupations:", matched_occupations_str)
+    #start the BMC of the best match in parallel with ask_AI when the match is clear enough
+    speculation = start_speculation(user_input,matched_occupations_list,matched_scores,matched_languages,user_language,matched_catalogs)
+    try:
         #asking AI if occupation matches
-        occupation_match, skills_paragraph = ask_AI(request.user_input,matched_occupations_str,user_language)
+        with timed_stage(timings, "ask_AI"):
+            occupation_match, skills_paragraph = ask_AI(user_input,matched_occupations_str,user_language)
         print("user_language Match:", user_language)
         print("Occupation Match:", occupation_match)
         print("\nSkills Required:\n", skills_paragraph)
@@ -877,18 +1414,303 @@ def process_data(request: UserInputRequest):
         if occupation_match != "no" and occupation_match != "" and occupation_match in matched_occupations_dict:
             occupation_match = matched_occupations_dict[occupation_match]
         print("Occupation Match NEWW:", occupation_match)
-        
-        #create the content that we will give in addition to our BMC prompt
-        content =generate_content(request.user_input,occupation_match,skills_paragraph,get_all_occupation_informations,matched_occupations_list,user_language,grouped_df)
-        print(content)
-        BMC_response=process_full_BMC(content,user_language)
-        print(BMC_response)
-        # Extract sections
+
+        # The catalog the chosen occupation comes from, which in auto mode can be another language than the idea
+        language_by_occupation = {label.lower(): language for label, language in zip(matched_occupations_list, matched_languages)}
+        catalog = matched_catalogs.get(language_by_occupation.get(occupation_match.lower()), matched_catalogs.get(user_language))
+
+        BMC_response = None
+        if speculation is not None:
+            # Its own stage, so process_full_BMC keeps one sample per real BMC call
+            with timed_stage(timings, "speculation_wait"):
+                BMC_response = take_speculation(speculation, occupation_match)
+        if BMC_response is None:
+            #create the content that we will give in addition to our BMC prompt
+            with timed_stage(timings, "generate_content"):
+                content =generate_content(user_input,occupation_match,skills_paragraph,get_all_occupation_informations,matched_occupations_list,user_language,catalog)
+            print(content)
+            with timed_stage(timings, "process_full_BMC"):
+                BMC_response=process_full_BMC(content,user_language)
+    finally:
+        # ask_AI failed before the speculation could be used
+        if speculation is not None and speculation.outcome is None:
+            discard_speculation(speculation, "abandoned")
+    print(BMC_response)
+    # Extract sections
+    with timed_stage(timings, "extract_sections"):
         bmc_sections = extract_sections(BMC_response,user_language)
+    return {
+        "sections": bmc_sections,
+        "occupation_match": occupation_match,
+        "matched_occupations": [
+            {"label": label, "score": score, "language": language}
+            for label, score, language in zip(matched_occupations_list, matched_scores, matched_languages)
+        ],
+        "language": user_language,
+        "catalog_version": catalog_version,
+        "timings": timings,
+        "speculation": speculation.outcome if speculation is not None else None,
+    }
+
+
+# Create an endpoint to trigger the processing
+@app.post("/process-data", response_model=ProcessedDataResponse)
+def process_data(request: UserInputRequest):
+    try:   
+        result = request_profiler.run("process-data", run_pipeline, request.user_input, request.language)
         #JSONIFY the response
-        bmc_sections_json = json.dumps(bmc_sections, indent=4, ensure_ascii=False)
+        bmc_sections_json = json.dumps(result["sections"], indent=4, ensure_ascii=False)
         print(bmc_sections_json)
-        return {"message": bmc_sections_json}
+        return {"message": bmc_sections_json, "catalog_version": result["catalog_version"]}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# response_model documents the shape; the response is returned already rendered, which skips FastAPI's
+# validation and jsonable_encoder pass over a dict that to_v2_response builds in exactly that shape
+@app.post("/v2/process-data", response_model=BMCResponseV2, response_class=ORJSONResponse)
+def process_data_v2(request: UserInputRequest):
+    try:
+        result = request_profiler.run("process-data-v2", run_pipeline, request.user_input, request.language)
+        return ORJSONResponse(to_v2_response(result))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Background jobs: POST /jobs answers at once and a bounded pool of threads runs the pipeline,
+# so a slow LLM call never holds an HTTP connection open (and a proxy timeout never wastes it)
+job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="bmc-job")
+job_counts = {"queued": 0, "running": 0}
+job_counts_lock = threading.Lock()
+job_store = SQLiteJobStore(JOB_DB_PATH) if JOB_STORE == "sqlite" else InMemoryJobStore()
+# Tells this process apart from an earlier one that had the same pid
+JOB_BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def job_owner():
+    # Computed per call: with gunicorn --preload this module is imported before the workers fork
+    return f"{os.getpid()}:{JOB_BOOT_ID}"
+
+
+def job_owner_is_gone(owner):
+    # True when the process that owns a job no longer runs (only processes on this host can be checked)
+    if owner == job_owner():
+        return False
+    try:
+        pid = int(str(owner).split(":")[0])
+    except ValueError:
+        return True
+    if pid == os.getpid():
+        # An earlier process that had our pid
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+def expire_job(job):
+    # Fails a job whose worker is gone or that is unfinished past JOB_RUN_TTL, so waiting clients get an answer
+    if job["status"] in FINISHED_STATUSES:
+        return job
+    if job_owner_is_gone(job.get("owner")):
+        error = "Worker stopped before the job finished"
+    elif job["created_at"] < time.time() - JOB_RUN_TTL:
+        error = "Job expired before it finished"
+    else:
+        return job
+    job_store.fail_unfinished(lambda candidate: candidate["id"] == job["id"], error)
+    return job_store.get(job["id"]) or dict(job, status="failed", error=error)
+
+JOB_QUEUE_DEPTH = Gauge("bmc_job_queue_depth", "Jobs accepted and waiting for a worker")
+JOB_RUNNING = Gauge("bmc_jobs_running", "Jobs currently running")
+JOB_WAIT_SECONDS = Histogram(
+    "bmc_job_wait_seconds", "Time a job waited in the queue",
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+JOB_RUN_SECONDS = Histogram(
+    "bmc_job_run_seconds", "Time spent running a job",
+    buckets=(1, 2.5, 5, 10, 20, 30, 45, 60, 90, 120, 300),
+)
+JOB_FINISHED = Counter("bmc_jobs_finished_total", "Finished jobs", ["status"])
+JOB_REJECTED = Counter("bmc_jobs_rejected_total", "Jobs rejected because the queue was full")
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+
+def run_job(job_id: str, user_input: str, language: str):
+    started_at = time.time()
+    with job_counts_lock:
+        job_counts["queued"] -= 1
+        job_counts["running"] += 1
+        JOB_QUEUE_DEPTH.set(job_counts["queued"])
+        JOB_RUNNING.set(job_counts["running"])
+    try:
+        job = job_store.get(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            # Expired or purged while it was queued
+            return
+        JOB_WAIT_SECONDS.observe(started_at - job["created_at"])
+        job_store.update(job_id, status="running", started_at=started_at)
+        try:
+            result = request_profiler.run("job", run_pipeline, user_input, language)
+            job_store.update(job_id, status="done", result=result, finished_at=time.time())
+            JOB_FINISHED.labels(status="done").inc()
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            job_store.update(job_id, status="failed", error=str(e), finished_at=time.time())
+            JOB_FINISHED.labels(status="failed").inc()
+    finally:
+        JOB_RUN_SECONDS.observe(time.time() - started_at)
+        with job_counts_lock:
+            job_counts["running"] -= 1
+            JOB_RUNNING.set(job_counts["running"])
+
+
+@app.post("/jobs", status_code=202, response_model=JobResponse)
+def create_job(request: UserInputRequest):
+    # Fail fast on a bad language instead of queueing a job that can only fail
+    if request.language == "auto":
+        if not ENABLE_AUTO_LANGUAGE:
+            raise HTTPException(status_code=400, detail="Language auto-detection is disabled")
+    else:
+        try:
+            get_file_path_by_language(request.language)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    with job_counts_lock:
+        if job_counts["queued"] >= JOB_QUEUE_SIZE:
+            JOB_REJECTED.inc()
+            raise HTTPException(status_code=429, detail="Job queue is full, retry later", headers={"Retry-After": "10"})
+        job_counts["queued"] += 1
+        JOB_QUEUE_DEPTH.set(job_counts["queued"])
+
+    try:
+        job_store.purge(time.time() - JOB_TTL, time.time() - JOB_RUN_TTL)
+        job_id = uuid.uuid4().hex
+        job = job_store.create(job_id, {"user_input": request.user_input, "language": request.language}, job_owner())
+        job_executor.submit(run_job, job_id, request.user_input, request.language)
     except Exception as e:
+        with job_counts_lock:
+            job_counts["queued"] -= 1
+            JOB_QUEUE_DEPTH.set(job_counts["queued"])
         raise HTTPException(status_code=500, detail=str(e))
+    return job
+
+
+def get_job_or_404(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return expire_job(job)
+
+
+# Long-poll: with ?wait=N the call returns as soon as the job finishes, or after N seconds with its current status
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, wait: float = 0):
+    # The store is synchronous (SQLite connects and may wait on a lock), so it is called from the threadpool
+    # to keep the event loop free for the other requests
+    job = await run_in_threadpool(get_job_or_404, job_id)
+    deadline = time.monotonic() + min(max(wait, 0), JOB_MAX_WAIT)
+    while job["status"] not in FINISHED_STATUSES and time.monotonic() < deadline:
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+        job = await run_in_threadpool(get_job_or_404, job_id)
+    return job
+
+
+# Server-sent events: one "status" event per change, the last one carries the result
+@app.get("/jobs/{job_id}/events")
+async def stream_job(job_id: str):
+    job = await run_in_threadpool(get_job_or_404, job_id)
+
+    async def events():
+        current = job
+        last_status = None
+        last_sent = time.monotonic()
+        while True:
+            if current["status"] != last_status:
+                last_status = current["status"]
+                last_sent = time.monotonic()
+                yield f"event: status\ndata: {JobResponse(**current).model_dump_json()}\n\n"
+                if last_status in FINISHED_STATUSES:
+                    return
+            elif time.monotonic() - last_sent > 15:
+                # Comment line keeps proxies from closing an idle stream
+                last_sent = time.monotonic()
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            current = await run_in_threadpool(job_store.get, job_id)
+            if current is None:
+                return
+            current = await run_in_threadpool(expire_job, current)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # Closed unless a token is configured: these endpoints reload catalogs and turn profiling on
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.get("/admin/catalogs", dependencies=[Depends(require_admin)])
+def list_catalogs():
+    return {
+        language: {"version": catalog.version, "occupations": len(catalog.labels), "file": catalog.file_path}
+        for language, catalog in catalogs.items()
+    }
+
+
+# Reloading runs in the background: the call returns at once and requests keep the current catalog until the swap.
+# This worker reloads at once, the others within CATALOG_GENERATION_INTERVAL seconds.
+@app.post("/admin/reload-catalogs", status_code=202, dependencies=[Depends(require_admin)])
+def reload_catalogs_endpoint(language: Optional[str] = None):
+    if language is not None:
+        try:
+            get_file_path_by_language(language)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    languages = [language] if language else None
+    threading.Thread(target=reload_catalogs, args=(languages,), daemon=True, name="catalog-reload").start()
+    # The other worker processes pick the reload up from the generation file
+    if CATALOG_GENERATION_INTERVAL > 0:
+        bump_catalog_generation(languages)
+    return {"message": "Catalog reload started", "versions": {lang: c.version for lang, c in catalogs.items()}}
+
+
+# Profile the next `requests` pipeline runs and/or a `sample_rate` share of all runs, both 0 turns profiling off
+@app.post("/admin/profile", dependencies=[Depends(require_admin)])
+def configure_profiling(requests: int = 0, sample_rate: float = 0.0):
+    request_profiler.configure(requests, sample_rate)
+    return request_profiler.state()
+
+
+@app.get("/admin/profiles", dependencies=[Depends(require_admin)])
+def list_profiles():
+    return [
+        {key: value for key, value in profile.items() if key != "collapsed"}
+        for profile in request_profiler.profiles
+    ]
+
 
+# Collapsed stacks of one profile, ready for flamegraph.pl or speedscope
+@app.get("/admin/profiles/{profile_id}", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+def get_profile(profile_id: str):
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile: {profile_id}")
+    return profile["collapsed"]
@@ -0,0 +1,33 @@
+import sys
+
+import psutil
+
+# Prints the memory of a gunicorn master and its workers.
+# USS is the memory unique to a process (what one more worker costs), PSS splits shared pages between
+# the processes that map them, RSS counts shared pages in full for every process.
+# usage: python measure_memory.py <gunicorn master pid>
+
+
+def describe(process):
+    info = process.memory_full_info()
+    return f"pid {process.pid:>7}  rss {info.rss / 2**20:8.1f} MiB  pss {info.pss / 2**20:8.1f} MiB  uss {info.uss / 2**20:8.1f} MiB"
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("usage: python measure_memory.py <gunicorn master pid>")
+        sys.exit(1)
+
+    master = psutil.Process(int(sys.argv[1]))
+    workers = master.children()
+    print("master  " + describe(master))
+    total_uss = 0
+    for worker in workers:
+        total_uss += worker.memory_full_info().uss
+        print("worker  " + describe(worker))
+    if workers:
+        print(f"{len(workers)} workers, mean unique memory per worker {total_uss / len(workers) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
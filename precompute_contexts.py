@@ -0,0 +1,28 @@
+import argparse
+import glob
+import time
+
+from catalog import DEFAULT_CONTEXT_MAX_CHARS, write_contexts
+
+# Builds the prompt context block of every occupation once, offline, and stores it next to each catalog
+# as grouped_df_<language>.contexts.json. The service loads it with the catalog; without it (or when it
+# was built from another version of the catalog) the service builds the blocks itself at load time.
+# usage: python precompute_contexts.py [--max-chars 3000] [grouped_df_en.pkl ...]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the occupation contexts used in the BMC prompt")
+    parser.add_argument("files", nargs="*", help="catalog files, all grouped_df_*.pkl in the current directory by default")
+    parser.add_argument("--max-chars", type=int, default=DEFAULT_CONTEXT_MAX_CHARS,
+                        help="length cap of one context block, must match CONTEXT_MAX_CHARS of the service")
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob("grouped_df_*.pkl"))
+    for file_path in files:
+        start = time.perf_counter()
+        output_path = write_contexts(file_path, args.max_chars)
+        print(f"{file_path} -> {output_path} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import defaultdict, deque
+
+import yappi
+
+# Opt-in profiling of whole pipeline runs with yappi (wall clock, so LLM waits show up).
+# Each profiled run produces collapsed stacks ("frame;frame;frame microseconds" per line),
+# the input format of flamegraph.pl, speedscope and inferno.
+
+# Functions reported as stages in the profile summary
+STAGES = (
+    "find_top_matching_occupations", "ask_AI", "generate_content",
+    "process_full_BMC", "extract_sections",
+)
+
+# Subtrees cheaper than this are folded into their parent frame to keep the output small
+MIN_FRAME_SECONDS = 0.0001
+MAX_STACK_DEPTH = 64
+
+
+def frame_name(stat):
+    return f"{stat.name} ({os.path.basename(stat.module)}:{stat.lineno})".replace(";", ",")
+
+
+def _collapse(by_name, stat, path, ttot, out):
+    # yappi keeps a call graph, not stacks: a child's time under this parent is known, but its own
+    # children's times are totals over all callers, so they are scaled by the share spent under this parent
+    scale = ttot / stat.ttot if stat.ttot else 0.0
+    children_ttot = 0.0
+    for child in stat.children:
+        child_ttot = child.ttot * scale
+        children_ttot += child_ttot
+        child_frame = frame_name(child)
+        child_stat = by_name.get(child.full_name)
+        if (child_stat is None or child_frame in path or len(path) >= MAX_STACK_DEPTH
+                or child_ttot < MIN_FRAME_SECONDS):
+            out[";".join(path + [child_frame])] += child_ttot
+        else:
+            _collapse(by_name, child_stat, path + [child_frame], child_ttot, out)
+    out[";".join(path)] += max(ttot - children_ttot, 0.0)
+
+
+def collapse_stacks(stats, root_name):
+    by_name = {stat.full_name: stat for stat in stats}
+    out = defaultdict(float)
+    for stat in stats:
+        if stat.name == root_name:
+            _collapse(by_name, stat, [frame_name(stat)], stat.ttot, out)
+    lines = []
+    for stack, seconds in out.items():
+        microseconds = int(seconds * 1e6)
+        if microseconds > 0:
+            lines.append(f"{stack} {microseconds}")
+    return "\n".join(sorted(lines)) + "\n"
+
+
+class RequestProfiler:
+    def __init__(self, keep=20, output_dir=None):
+        self.remaining = 0
+        self.sample_rate = 0.0
+        self.profiles = deque(maxlen=keep)
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        # yappi is process wide, so only one run is profiled at a time
+        self.active = threading.Lock()
+
+    def configure(self, requests=0, sample_rate=0.0):
+        with self.lock:
+            self.remaining = max(requests, 0)
+            self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    def state(self):
+        return {"remaining": self.remaining, "sample_rate": self.sample_rate, "profiles": len(self.profiles)}
+
+    def _take_turn(self):
+        with self.lock:
+            if self.remaining > 0:
+                self.remaining -= 1
+                return True
+        return random.random() < self.sample_rate
+
+    def run(self, label, func, *args, **kwargs):
+        # Disabled fast path: two attribute reads per request
+        if not self.remaining and not self.sample_rate:
+            return func(*args, **kwargs)
+        if not self.active.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            if not self._take_turn():
+                return func(*args, **kwargs)
+            return self._profile(label, func, *args, **kwargs)
+        finally:
+            self.active.release()
+
+    def _profile(self, label, func, *args, **kwargs):
+        yappi.clear_stats()
+        yappi.set_clock_type("wall")
+        # profile_threads=False: only the thread running this request is profiled
+        yappi.start(builtins=False, profile_threads=False)
+        started_at = time.time()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            yappi.stop()
+            self._record(label, func.__name__, started_at, time.time() - started_at)
+
+    def _record(self, label, root_name, started_at, duration):
+        # Runs while the request returns (or raises): a failure here is logged and never replaces its outcome
+        try:
+            stats = yappi.get_func_stats()
+            stage_seconds = defaultdict(float)
+            for stat in stats:
+                if stat.name in STAGES:
+                    stage_seconds[stat.name] += stat.ttot
+            profile = {
+                "id": uuid.uuid4().hex[:12],
+                "label": label,
+                "started_at": started_at,
+                "duration": duration,
+                "stages": dict(stage_seconds),
+                "collapsed": collapse_stacks(stats, root_name),
+            }
+            self.profiles.append(profile)
+        except Exception as e:
+            print(f"Profile of {label} could not be built: {e}")
+            return
+        finally:
+            yappi.clear_stats()
+        if self.output_dir:
+            try:
+                with open(os.path.join(self.output_dir, f"{profile['id']}.collapsed"), "w", encoding="utf-8") as f:
+                    f.write(profile["collapsed"])
+            except OSError as e:
+                print(f"Profile {profile['id']} could not be written to {self.output_dir}: {e}")
+
+    def get(self, profile_id):
+        for profile in self.profiles:
+            if profile["id"] == profile_id:
+                return profile
+        # Profiles taken by the other worker processes are only reachable through output_dir
+        if self.output_dir and re.fullmatch(r"[0-9a-f]{12}", profile_id):
+            try:
+                with open(os.path.join(self.output_dir, f"{profile_id}.collapsed"), encoding="utf-8") as f:
+                    return {"id": profile_id, "collapsed": f.read()}
+            except OSError:
+                pass
+        return None
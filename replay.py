@@ -0,0 +1,192 @@
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Replays recorded traffic (a JSONL file of {"user_input": ..., "language": ...}) through the full
+# process_data pipeline, by default against the fake LLM backend, and writes a JSON report with the
+# per-stage timings, the ranking cache hit rate and how many of the nine BMC sections were parsed.
+# Two reports can be compared to check a performance change on realistic input.
+# usage:
+#   python replay.py run traffic.jsonl --output before.json [--rate 5] [--concurrency 4]
+#   python replay.py diff before.json after.json
+
+SECTION_COUNT = 9
+
+
+def read_traffic(path, limit=None):
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            records.append({"user_input": record["user_input"], "language": record.get("language", "en")})
+            if limit and len(records) >= limit:
+                break
+    return records
+
+
+def percentile(values, share):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)]
+
+
+def summarize(records, wall_seconds, cache_hits, cache_misses):
+    ok = [r for r in records if r["ok"]]
+    summary = {
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "wall_seconds": wall_seconds,
+        "throughput": len(records) / wall_seconds if wall_seconds else None,
+        "cache_hit_rate": cache_hits / (cache_hits + cache_misses) if cache_hits + cache_misses else None,
+        "sections_found_mean": statistics.mean(r["sections_found"] for r in ok) if ok else None,
+        "complete_share": sum(r["sections_found"] == SECTION_COUNT for r in ok) / len(ok) if ok else None,
+    }
+    speculated = [r for r in ok if r.get("speculation")]
+    summary["speculation_rate"] = len(speculated) / len(ok) if ok else None
+    summary["speculation_hit_rate"] = (
+        sum(r["speculation"] == "hit" for r in speculated) / len(speculated) if speculated else None
+    )
+    stages = sorted({stage for r in ok for stage in r["timings"]}) + ["total"]
+    for stage in stages:
+        values = [r["total"] if stage == "total" else r["timings"].get(stage, 0.0) for r in ok]
+        summary[f"{stage}_mean"] = statistics.mean(values) if values else None
+        summary[f"{stage}_p50"] = percentile(values, 0.5)
+        summary[f"{stage}_p95"] = percentile(values, 0.95)
+    return summary
+
+
+def run(args):
+    if not args.real_llm:
+        os.environ["LLM_BACKEND"] = "fake"
+    # Imported here so the backend choice above applies
+    import mainV4
+
+    traffic = read_traffic(args.traffic, args.limit)
+    started = time.perf_counter()
+    hits_before = mainV4.match_cache_stats["hits"]
+    misses_before = mainV4.match_cache_stats["misses"]
+
+    def replay_one(position):
+        record = traffic[position]
+        if args.rate:
+            # Open-loop pacing: request i starts at i / rate seconds, whatever happened before
+            delay = started + position / args.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        start = time.perf_counter()
+        try:
+            result = mainV4.run_pipeline(record["user_input"], record["language"])
+        except Exception as e:
+            return {"index": position, **record, "ok": False, "error": str(e), "total": time.perf_counter() - start}
+        return {
+            "index": position,
+            **record,
+            "ok": True,
+            "total": time.perf_counter() - start,
+            "timings": result["timings"],
+            "sections_found": len(result["sections"]),
+            "occupation_match": result["occupation_match"],
+            "catalog_version": result["catalog_version"],
+            "speculation": result["speculation"],
+        }
+
+    # The pipeline prints every step, keep the console readable unless asked for
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with output, ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        records = list(executor.map(replay_one, range(len(traffic))))
+
+    summary = summarize(
+        records,
+        time.perf_counter() - started,
+        mainV4.match_cache_stats["hits"] - hits_before,
+        mainV4.match_cache_stats["misses"] - misses_before,
+    )
+    report = {
+        "traffic": args.traffic,
+        "llm_backend": mainV4.LLM_BACKEND,
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "summary": summary,
+        "records": records,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print_summary(summary)
+    print(f"report written to {args.output}")
+
+
+def print_summary(summary):
+    for key, value in summary.items():
+        print(f"{key:>28}  {format_value(value)}")
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.4f}"
+    return str(value)
+
+
+def diff(args):
+    with open(args.before, encoding="utf-8") as f:
+        before = json.load(f)
+    with open(args.after, encoding="utf-8") as f:
+        after = json.load(f)
+
+    print(f"{'metric':>28}  {'before':>10}  {'after':>10}  {'change':>8}")
+    for key in sorted(set(before["summary"]) | set(after["summary"])):
+        old = before["summary"].get(key)
+        new = after["summary"].get(key)
+        change = ""
+        if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+            change = f"{(new - old) / old * 100:+.1f}%"
+        print(f"{key:>28}  {format_value(old):>10}  {format_value(new):>10}  {change:>8}")
+
+    # A performance change should not change what the pipeline answers
+    pairs = list(zip(before["records"], after["records"]))
+    changed_match = sum(
+        b.get("occupation_match") != a.get("occupation_match") for b, a in pairs if b["ok"] and a["ok"]
+    )
+    changed_sections = sum(
+        b.get("sections_found") != a.get("sections_found") for b, a in pairs if b["ok"] and a["ok"]
+    )
+    print(f"\n{len(pairs)} requests compared: {changed_match} different occupation matches, "
+          f"{changed_sections} different section counts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded traffic through the BMC pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="replay a JSONL file and write a report")
+    run_parser.add_argument("traffic", help="JSONL file of {\"user_input\", \"language\"} records")
+    run_parser.add_argument("--output", default="replay_report.json")
+    run_parser.add_argument("--rate", type=float, default=0, help="requests per second, 0 for as fast as possible")
+    run_parser.add_argument("--concurrency", type=int, default=1)
+    run_parser.add_argument("--limit", type=int, default=None, help="replay only the first N records")
+    run_parser.add_argument("--real-llm", action="store_true", help="call Gemini instead of the fake backend")
+    run_parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own output")
+
+    diff_parser = commands.add_parser("diff", help="compare two reports")
+    diff_parser.add_argument("before")
+    diff_parser.add_argument("after")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    else:
+        diff(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())